@@ -0,0 +1,148 @@
+"""
+Benchmark the embedding backends against the torch baseline.
+
+Reports single-query encode latency, document throughput, cosine
+similarity to the torch vectors (checked against EMBEDDING_TOLERANCE)
+and recall@k of nearest-neighbour search, both with a backend's own
+document vectors and against torch-built document vectors (the case of
+querying an existing collection with a new backend). On a CUDA machine
+the torch baseline runs on the GPU; set CUDA_VISIBLE_DEVICES= to compare
+on CPU.
+
+Usage:
+    python -m src.benchmark_embeddings --data-dir fhir --backends torch onnx int8 --threads 4 \\
+        --output embedding_benchmark.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+
+import numpy as np
+
+from src.data_processor import SyntheaDataProcessor
+from src.vector_store import get_embeddings, EMBEDDING_BACKENDS, EMBEDDING_TOLERANCE, EMBEDDING_MODEL
+
+
+QUERIES = [
+    "What medications am I currently taking?",
+    "Do I have any allergies?",
+    "What was my most recent blood pressure?",
+    "Who prescribed my medication and where?",
+    "What conditions have I been diagnosed with?",
+    "When was my last visit to the doctor?",
+    "What vaccines have I received?",
+    "What were my cholesterol results?",
+    "Have I had any surgeries or procedures?",
+    "What is my body mass index?",
+]
+
+
+def setup_argparse():
+    """Set up argument parsing for the benchmark."""
+    parser = argparse.ArgumentParser(description='Benchmark MiniLM embedding backends')
+
+    parser.add_argument('--data-dir', type=str, required=True,
+                        help='Directory containing Synthea output data')
+    parser.add_argument('--backends', nargs='+', default=EMBEDDING_BACKENDS, choices=EMBEDDING_BACKENDS,
+                        help='Backends to compare (torch is always run as the baseline)')
+    parser.add_argument('--threads', type=int,
+                        help='Number of CPU threads for inference')
+    parser.add_argument('--max-docs', type=int, default=500,
+                        help='Number of documents to embed (default: 500)')
+    parser.add_argument('--k', type=int, default=5,
+                        help='Neighbours used for recall@k (default: 5)')
+    parser.add_argument('--repeats', type=int, default=20,
+                        help='Single-query latency samples (default: 20)')
+    parser.add_argument('--model', type=str, default=EMBEDDING_MODEL,
+                        help=f'Model name or local path (default: {EMBEDDING_MODEL})')
+    parser.add_argument('--output', type=str,
+                        help='Optional JSON file to record the results in')
+
+    return parser.parse_args()
+
+
+def normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def top_k(query_vectors: np.ndarray, document_vectors: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(query_vectors @ document_vectors.T), axis=1)[:, :k]
+
+
+def recall_at_k(expected: np.ndarray, actual: np.ndarray) -> float:
+    hits = [len(set(e) & set(a)) / len(e) for e, a in zip(expected, actual)]
+    return sum(hits) / len(hits)
+
+
+def run_backend(backend, texts, threads, repeats, model_name):
+    """Embed the corpus and queries with one backend, timing both."""
+    embeddings = get_embeddings(backend, threads, model_name)
+    embeddings.embed_query(QUERIES[0])  # warm-up
+
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        embeddings.embed_query(QUERIES[i % len(QUERIES)])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    document_vectors = embeddings.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "latency_ms": 1000 * statistics.median(latencies),
+        "docs_per_s": len(texts) / elapsed,
+        "documents": normalize(document_vectors),
+        "queries": normalize([embeddings.embed_query(query) for query in QUERIES]),
+    }
+
+
+def main():
+    """Run the benchmark and print a comparison table."""
+    args = setup_argparse()
+
+    documents = SyntheaDataProcessor(args.data_dir).process_for_embedding()
+    texts = [document.page_content for document in documents[:args.max_docs]]
+    print(f"Embedding {len(texts)} documents and {len(QUERIES)} queries, threads={args.threads or 'default'}")
+
+    backends = ["torch"] + [backend for backend in args.backends if backend != "torch"]
+    results = {backend: run_backend(backend, texts, args.threads, args.repeats, args.model) for backend in backends}
+    baseline = results["torch"]
+    expected = top_k(baseline["queries"], baseline["documents"], args.k)
+
+    report = {"model": args.model, "documents": len(texts), "threads": args.threads, "k": args.k,
+              "platform": platform.platform(), "cpu_count": os.cpu_count(), "backends": {}}
+    print(f"{'backend':<8}{'query ms':>10}{'docs/s':>10}{'min cos':>10}{'mean cos':>10}"
+          f"{'recall@' + str(args.k):>11}{'vs torch db':>13}  within tolerance")
+    for backend, result in results.items():
+        cosine = np.sum(result["documents"] * baseline["documents"], axis=1)
+        recall = recall_at_k(expected, top_k(result["queries"], result["documents"], args.k))
+        cross_recall = recall_at_k(expected, top_k(result["queries"], baseline["documents"], args.k))
+        compatible = cosine.min() >= EMBEDDING_TOLERANCE[backend] - 1e-6
+        print(f"{backend:<8}{result['latency_ms']:>10.2f}{result['docs_per_s']:>10.1f}"
+              f"{cosine.min():>10.4f}{cosine.mean():>10.4f}{recall:>11.3f}{cross_recall:>13.3f}"
+              f"  {'yes' if compatible else 'NO'} (>= {EMBEDDING_TOLERANCE[backend]})")
+        report["backends"][backend] = {
+            "query_latency_ms": result["latency_ms"],
+            "docs_per_s": result["docs_per_s"],
+            "min_cosine_to_torch": float(cosine.min()),
+            "mean_cosine_to_torch": float(cosine.mean()),
+            "recall_at_k": recall,
+            "recall_at_k_vs_torch_db": cross_recall,
+            "tolerance": EMBEDDING_TOLERANCE[backend],
+            "within_tolerance": bool(compatible),
+        }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import BaseRetriever
 from src.prompt_templates import get_prompt_template
+from src.patient_digest import is_summary_query
+from src.model_router import ModelRouter
+from langchain_core.documents import Document
 from typing import Dict, Any
 
 def get_llm(model_name: str, temperature: float = 0):
@@ -29,7 +32,9 @@ class HealthManagementChatbot:
             # streamlit
             prompt_type: str = "basic",
             # vector_db_path: str = "vector_db_v1"
-            data_processor=None
+            data_processor=None,
+            digest_store=None,
+            router: ModelRouter = None
     ):
         """
         Initialize the health management chatbot.
@@ -37,8 +42,10 @@ class HealthManagementChatbot:
         Args:
             retriever: The retriever for getting relevant health records
             prompt_template: The prompt template to use for structuring responses
-            model_name: The name of the language model to use
+            model_name: The name of the language model to use, or "auto" to route per query
             temperature: The temperature setting for response generation
+            digest_store: Optional PatientDigestStore with precomputed patient summaries
+            router: Optional ModelRouter choosing the model per query (overrides model_name)
         """
         
         self.retriever = retriever
@@ -47,8 +54,13 @@ class HealthManagementChatbot:
         # streamlit
         # self.prompt_template = get_prompt_template(prompt_type)
 
-        self.llm = get_llm(model_name=model_name, temperature=temperature)
-        if self.retriever and self.prompt_template:
+        if router is None and model_name == "auto":
+            router = ModelRouter(temperature=temperature)
+        self.router = router
+
+        # With a router, models and chains are picked per query in _answer_with_router
+        self.llm = None if self.router else get_llm(model_name=model_name, temperature=temperature)
+        if self.llm is not None and self.retriever and self.prompt_template:
             # Create document chain
             self.document_chain = create_stuff_documents_chain(self.llm, self.prompt_template)
 
@@ -57,6 +69,7 @@ class HealthManagementChatbot:
         else:
             self.retrieval_chain = None
         self.data_processor = data_processor
+        self.digest_store = digest_store
 
     def process_query(self, query: str, patient_id: str = None) -> Dict[str, Any]:
         """
@@ -95,15 +108,29 @@ class HealthManagementChatbot:
         id_context = f"Patient ID: {patient_id}" if patient_id else ""
         full_query = f"{query}\n{id_context}" if id_context else query
 
+        # Serve "summarize my health" straight from the precomputed digest,
+        # otherwise use the digest as cheap extra context
+        digest = self.digest_store.get_digest(patient_id) if self.digest_store and patient_id else None
+        if digest and is_summary_query(query):
+            return digest
+
         # if self.retriever and self.prompt_template:
         #     results = self.retriever.get_relevant_documents(query)
         #     patient_name = results[0].metadata.get("name", "the patient") if results else "the patient"
         #     query = f"My name is {patient_name}. {query}"
 
-        if self.retrieval_chain:
+        if self.router:
+            return self._answer_with_router(query, full_query, patient_id, digest)
+        elif self.retrieval_chain and digest:
+            documents = self.retriever.invoke(full_query)
+            digest_document = Document(page_content=digest, metadata={"patient_id": patient_id, "source": "digest"})
+            return self.document_chain.invoke({"input": full_query, "context": [digest_document] + documents})
+        elif self.retrieval_chain:
             response = self.retrieval_chain.invoke({"input": full_query})
             return response.get("answer", "[No answer found in response]")
         else:
+            if digest:
+                full_query = f"Patient summary:\n{digest}\n\n{full_query}"
             response = self.llm.invoke(full_query)
             return response.content if hasattr(response, "content") else response
         
@@ -115,5 +142,29 @@ class HealthManagementChatbot:
         #     return response.content if hasattr(response, "content") else response
         # return response["answer"]
 
+    def _answer_with_router(self, query: str, full_query: str, patient_id: str = None, digest: str = None) -> str:
+        """
+        Answer a query with the model picked by the router.
+
+        Retrieval runs first so the router can take the context size into account.
+        """
+        documents = []
+        if self.retriever and self.prompt_template:
+            documents = self.retriever.invoke(full_query)
+        # The digest rides along with every patient query, so only retrieved chunks count towards routing
+        context_chars = sum(len(document.page_content) for document in documents)
+        if digest:
+            documents = [Document(page_content=digest, metadata={"patient_id": patient_id, "source": "digest"})] + documents
+
+        def call(llm):
+            if self.retriever and self.prompt_template:
+                document_chain = create_stuff_documents_chain(llm, self.prompt_template)
+                return document_chain.invoke({"input": full_query, "context": documents})
+            prompt = f"Patient summary:\n{digest}\n\n{full_query}" if digest else full_query
+            response = llm.invoke(prompt)
+            return response.content if hasattr(response, "content") else response
+
+        return self.router.run(query, call, context_chars=context_chars)
+
     def get_patient_record(self, patient_id: str):
         return self.data_processor.get_patient_record_by_id(patient_id)
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Offline check of the model router with stub models standing in for
+Ollama and OpenAI. Needs no network, API keys or LangChain.
+
+Usage:
+    python -m src.check_model_router
+"""
+
+import threading
+import time
+
+from src.model_router import ModelRouter
+
+
+class StubModel:
+    """Minimal chat model: answers after a delay, fails, or hangs."""
+
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False, hang: bool = False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.hang = hang
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        if self.hang:
+            threading.Event().wait()  # never returns
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(f"{self.name} unavailable")
+        return f"{self.name}: {prompt}"
+
+
+def make_router(fast: StubModel, strong: StubModel, timeout: float = 0.5) -> ModelRouter:
+    models = {"llama3.2": fast, "gpt-4o-mini": strong}
+    return ModelRouter(timeout=timeout, llm_factory=lambda name, temperature: models[name])
+
+
+def ask(router: ModelRouter, query: str, context_chars: int = 0) -> str:
+    return router.run(query, lambda llm: llm.invoke(query), context_chars=context_chars)
+
+
+def check_routing():
+    router = make_router(StubModel("fast"), StubModel("strong"))
+
+    assert ask(router, "What is my blood type?").startswith("fast")
+    assert ask(router, "Why did my cholesterol change?").startswith("strong")
+    assert ask(router, "What vaccines have I had?", context_chars=router.max_fast_context_chars + 1).startswith("strong")
+    assert ask(router, " ".join(["word"] * (router.max_fast_words + 1))).startswith("strong")
+    # k typical chunks of retrieved context still go to the fast model
+    assert router.classify("When was my last visit?", context_chars=5 * 1100)[0] == "llama3.2"
+    print("✅ routing")
+
+
+def check_fallback_on_error():
+    router = make_router(StubModel("fast", fail=True), StubModel("strong"))
+
+    assert ask(router, "What is my blood type?").startswith("strong")
+    decision = router.decisions[-1]
+    assert decision["model"] == "llama3.2" and decision["answered_by"] == "gpt-4o-mini"
+    assert decision["fallback"] and "ConnectionError" in decision["error"]
+    print("✅ fallback on error")
+
+
+def check_fallback_on_timeout():
+    timeout = 0.2
+    fast = StubModel("fast", hang=True)
+    router = make_router(fast, StubModel("strong"), timeout=timeout)
+
+    # More hung calls than a small worker pool would have: every fallback must still answer
+    for _ in range(6):
+        start = time.perf_counter()
+        assert ask(router, "What is my blood type?").startswith("strong")
+        assert time.perf_counter() - start < 2 * timeout + 0.5
+
+    decision = router.decisions[-1]
+    assert decision["fallback"] and "TimeoutError" in decision["error"]
+    # Wall time includes the timeout the user sat through; model time does not
+    assert decision["total_latency"] >= timeout > decision["latency"]
+    assert fast.calls == 6
+    print("✅ fallback on timeout")
+
+
+def check_both_fail():
+    router = make_router(StubModel("fast", fail=True), StubModel("strong", hang=True), timeout=0.2)
+
+    try:
+        ask(router, "What is my blood type?")
+    except RuntimeError as e:
+        assert "ConnectionError" in str(e) and "TimeoutError" in str(e)
+    else:
+        raise AssertionError("expected RuntimeError when both models fail")
+
+    decision = router.decisions[-1]
+    assert decision["answered_by"] is None and decision["latency"] is None
+    assert "ConnectionError" in decision["error"] and "TimeoutError" in decision["fallback_error"]
+    assert decision["total_latency"] >= 0.2
+    assert router.stats()["failures"] == 1 and router.stats()["answered_by"] == {}
+    print("✅ both models fail")
+
+
+def check_stats():
+    router = make_router(StubModel("fast", delay=0.01), StubModel("strong", delay=0.1))
+    ask(router, "What is my blood type?")
+    ask(router, "What is my weight?")
+    ask(router, "Explain my lab results")
+
+    stats = router.stats()
+    assert stats["queries"] == 3
+    assert stats["answered_by"] == {"llama3.2": 2, "gpt-4o-mini": 1}
+    assert stats["fallbacks"] == 0 and stats["failures"] == 0
+    assert stats["mean_latency"]["gpt-4o-mini"] > stats["mean_latency"]["llama3.2"]
+    assert 0.1 < stats["estimated_seconds_saved"] < 0.25
+    print(f"✅ stats: {stats}")
+
+
+if __name__ == "__main__":
+    check_routing()
+    check_fallback_on_error()
+    check_fallback_on_timeout()
+    check_both_fail()
+    check_stats()
+    print("All model router checks passed.")
@@ -3,6 +3,9 @@ import os
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from typing import List, Dict, Any
+from src.reference_index import ReferenceIndex
+from src.timeline_index import TimelineIndex, resource_date, date_key
+from src.ingest_profile import IngestProfile, IngestReport
 
 
 class SyntheaDataProcessor:
@@ -10,18 +13,23 @@ class SyntheaDataProcessor:
     Processes Synthea FHIR data for use in a health management chatbot.
     """
 
-    def __init__(self, data_directory: str):
+    def __init__(self, data_directory: str, ingest_profile: IngestProfile = None):
         """
         Initialize the data processor with the directory containing Synthea output.
 
         Args:
             data_directory: Path to the directory containing Synthea FHIR JSON files
+            ingest_profile: Which resources/fields to embed (defaults to IngestProfile())
         """
         self.data_directory = data_directory
+        self.ingest_profile = ingest_profile or IngestProfile()
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200
         )
+        self.reference_index = None
+        self.timeline_index = None
+        self.ingest_report = None
 
     def load_patient_records(self) -> List[Dict[str, Any]]:
         """
@@ -88,31 +96,106 @@ class SyntheaDataProcessor:
 
     #     return chunks
     
+    def build_reference_index(self, records: List[Dict[str, Any]] = None) -> ReferenceIndex:
+        """
+        Build a lookup index over every resource in the loaded bundles.
+
+        Includes the practitioner and hospital bundles so references from
+        patient resources to clinicians and facilities can be resolved.
+
+        Args:
+            records: Optional pre-loaded bundles (loaded from disk if omitted)
+
+        Returns:
+            ReferenceIndex over all resources
+        """
+        if records is None:
+            records = self.load_all_health_records()
+
+        index = ReferenceIndex()
+        for record in records:
+            index.add_bundle(record)
+        return index
+
+    @staticmethod
+    def get_patient_resource(record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Find the Patient resource in a bundle.
+
+        Returns:
+            Patient resource, or empty dict for non-patient bundles
+        """
+        for entry in record.get("entry", []):
+            resource = entry.get("resource", {})
+            if resource.get("resourceType") == "Patient":
+                return resource
+        return {}
+
     def process_for_embedding(self) -> List[Document]:
         """
         Convert all patient data into LangChain Document format with metadata.
+
+        Each resource of a patient bundle becomes one Document. Linked
+        practitioner, facility and encounter details are resolved through
+        the reference index and written into both the text and the
+        metadata, so a single retrieved chunk answers "who and where".
+        Practitioner/hospital bundles only feed the index.
+
+        Also builds the per-patient timeline index, and stores each
+        resource's date as a YYYYMMDD integer under the ``date`` metadata
+        key so retrieval can pre-filter on a date window.
+
+        The ingest profile decides which resources are embedded and which
+        fields go into their text; the indexes still see every resource.
+        Savings are recorded in ``self.ingest_report``.
         """
+        records = self.load_all_health_records()
+        self.reference_index = self.build_reference_index(records)
+        self.timeline_index = TimelineIndex()
+        self.ingest_report = IngestReport()
+
         documents = []
-        for record in self.load_all_health_records():
-            patient_id = str(record.get("id") or "unknown_id")
-            name_info = record.get("name", [{}])[0]
+        for record in records:
+            patient = self.get_patient_resource(record)
+            if not patient:
+                continue
+            patient_id = str(patient.get("id") or "unknown_id")
+            name_info = patient.get("name", [{}])[0]
             full_name = " ".join(name_info.get("given", [""])).strip() + " " + name_info.get("family", "")
             full_name = full_name.strip() or "Unknown Name"
-            # Convert entire JSON to text (or modify to extract specific fields)
-            text = json.dumps(record, indent=2)
-
-            # doc = Document(
-            #     page_content=text,
-            #     metadata={"patient_id": patient_id, "name": full_name.strip(), }
-            # )
-            doc = Document(
-                page_content=text,
-                metadata={
-                    "patient_id": patient_id,
-                    "name": full_name,
-                    "source": f"record_{patient_id}"
-                })
-            documents.append(doc)
+
+            for entry in record.get("entry", []):
+                resource = entry.get("resource", {})
+                resource_type = resource.get("resourceType", "Unknown")
+                linked = self.reference_index.denormalize(resource)
+                when = resource_date(resource)
+                self.timeline_index.add(
+                    patient_id, resource,
+                    summary=self.reference_index.display(resource.get("medicationReference", {}))
+                )
+
+                original_bytes = len(json.dumps(resource, indent=2).encode('utf-8'))
+                if not self.ingest_profile.includes(resource_type):
+                    self.ingest_report.record(resource_type, original_bytes, 0, included=False)
+                    continue
+
+                header = [f"{resource_type} for patient {full_name}"]
+                header += [f"{key.replace('_', ' ').capitalize()}: {value}" for key, value in linked.items()]
+                text = "\n".join(header) + "\n" + json.dumps(self.ingest_profile.project(resource), indent=2)
+                self.ingest_report.record(resource_type, original_bytes, len(text.encode('utf-8')), included=True)
+
+                doc = Document(
+                    page_content=text,
+                    metadata={
+                        "patient_id": patient_id,
+                        "name": full_name,
+                        "source": f"record_{patient_id}",
+                        "resource_type": resource_type,
+                        **linked
+                    })
+                if when:
+                    doc.metadata["date"] = date_key(when)
+                documents.append(doc)
 
         return documents
 
@@ -0,0 +1,168 @@
+import json
+from typing import List, Dict, Any
+
+
+# Fields dropped from every resource: bookkeeping with no clinical value
+DEFAULT_DROP_FIELDS = ["meta", "identifier", "text"]
+
+# Per resourceType rules. "include": False skips the resource entirely;
+# "fields" lists the only top-level fields projected into the text.
+# Types not listed are included with DEFAULT_DROP_FIELDS removed.
+DEFAULT_RESOURCE_RULES = {
+    "Claim": {"include": False},
+    "ExplanationOfBenefit": {"include": False},
+    "Provenance": {"include": False},
+    "SupplyDelivery": {"include": False},
+    # Same note as the DiagnosticReport, base64 encoded
+    "DocumentReference": {"include": False},
+    "Patient": {"fields": ["gender", "birthDate", "deceasedDateTime", "name", "address",
+                           "maritalStatus", "communication"]},
+    "Encounter": {"fields": ["status", "class", "type", "period", "reasonCode", "hospitalization"]},
+    "Condition": {"fields": ["clinicalStatus", "verificationStatus", "category", "code",
+                             "onsetDateTime", "abatementDateTime", "recordedDate"]},
+    "Observation": {"fields": ["status", "category", "code", "effectiveDateTime", "valueQuantity",
+                               "valueCodeableConcept", "valueString", "component"]},
+    "DiagnosticReport": {"fields": ["status", "category", "code", "effectiveDateTime", "result"]},
+    "MedicationRequest": {"fields": ["status", "intent", "medicationCodeableConcept", "medicationReference",
+                                     "authoredOn", "dosageInstruction", "reasonCode"]},
+    "MedicationAdministration": {"fields": ["status", "medicationCodeableConcept", "effectiveDateTime",
+                                            "reasonCode"]},
+    "Medication": {"fields": ["code", "status"]},
+    "Procedure": {"fields": ["status", "code", "performedDateTime", "performedPeriod", "reasonCode"]},
+    "Immunization": {"fields": ["status", "vaccineCode", "occurrenceDateTime"]},
+    "AllergyIntolerance": {"fields": ["clinicalStatus", "verificationStatus", "type", "category",
+                                      "criticality", "code", "reaction", "recordedDate"]},
+    "CarePlan": {"fields": ["status", "intent", "category", "period", "activity", "addresses"]},
+    "CareTeam": {"fields": ["status", "period", "participant", "reasonCode"]},
+    "ImagingStudy": {"fields": ["status", "started", "procedureCode", "numberOfSeries"]},
+    "Device": {"fields": ["status", "deviceName", "type"]},
+}
+
+
+class IngestProfile:
+    """
+    Declarative ingest profile deciding which resources are embedded
+    and which of their fields are projected into the embedded text.
+    """
+
+    def __init__(self, resource_rules: Dict[str, Dict[str, Any]] = None,
+                 drop_fields: List[str] = None, default_include: bool = True):
+        """
+        Initialize the profile.
+
+        Args:
+            resource_rules: Per resourceType rules ({"include": bool, "fields": [...]})
+            drop_fields: Fields removed from resources without a "fields" projection
+            default_include: Whether resource types without a rule are embedded
+        """
+        self.resource_rules = DEFAULT_RESOURCE_RULES if resource_rules is None else resource_rules
+        self.drop_fields = DEFAULT_DROP_FIELDS if drop_fields is None else drop_fields
+        self.default_include = default_include
+
+    @classmethod
+    def from_file(cls, path: str) -> "IngestProfile":
+        """
+        Load a profile from a JSON file with optional "resources",
+        "drop_fields" and "default_include" keys.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        return cls(
+            resource_rules=data.get("resources"),
+            drop_fields=data.get("drop_fields"),
+            default_include=data.get("default_include", True)
+        )
+
+    @classmethod
+    def keep_all(cls) -> "IngestProfile":
+        """
+        Profile that embeds every resource unchanged.
+        """
+        return cls(resource_rules={}, drop_fields=[])
+
+    def includes(self, resource_type: str) -> bool:
+        """
+        Check whether resources of a type should be embedded.
+        """
+        return self.resource_rules.get(resource_type, {}).get("include", self.default_include)
+
+    def project(self, resource: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Keep only the configured fields of a resource.
+
+        ``resourceType`` and ``id`` are always kept.
+
+        Args:
+            resource: A FHIR resource
+
+        Returns:
+            The projected resource (a new dict)
+        """
+        fields = self.resource_rules.get(resource.get("resourceType"), {}).get("fields")
+        if fields is not None:
+            keep = {"resourceType", "id", *fields}
+            return {key: value for key, value in resource.items() if key in keep}
+        return {key: value for key, value in resource.items() if key not in self.drop_fields}
+
+
+class IngestReport:
+    """
+    Tracks how much an ingest profile saved, per resourceType.
+    """
+
+    def __init__(self):
+        self.by_type: Dict[str, Dict[str, int]] = {}
+
+    def record(self, resource_type: str, original_bytes: int, kept_bytes: int, included: bool) -> None:
+        """
+        Record one resource passing through the profile.
+
+        Args:
+            resource_type: The resource's type
+            original_bytes: Size of the full resource text
+            kept_bytes: Size of the embedded text (0 if excluded)
+            included: Whether the resource was embedded
+        """
+        stats = self.by_type.setdefault(resource_type, {
+            "resources": 0, "chunks": 0, "original_bytes": 0, "kept_bytes": 0
+        })
+        stats["resources"] += 1
+        stats["chunks"] += 1 if included else 0
+        stats["original_bytes"] += original_bytes
+        stats["kept_bytes"] += kept_bytes
+
+    def totals(self) -> Dict[str, int]:
+        """
+        Get totals across all resource types.
+
+        Returns:
+            Dictionary with resources, chunks, chunks_saved, original_bytes,
+            kept_bytes and bytes_saved
+        """
+        totals = {"resources": 0, "chunks": 0, "original_bytes": 0, "kept_bytes": 0}
+        for stats in self.by_type.values():
+            for key in totals:
+                totals[key] += stats[key]
+        totals["chunks_saved"] = totals["resources"] - totals["chunks"]
+        totals["bytes_saved"] = totals["original_bytes"] - totals["kept_bytes"]
+        return totals
+
+    def format(self) -> str:
+        """
+        Format the report as a table for the command line.
+        """
+        lines = [f"{'Resource type':<26}{'chunks':>8}{'dropped':>9}{'bytes in':>13}{'bytes out':>13}"]
+        for resource_type, stats in sorted(self.by_type.items(), key=lambda item: -item[1]["original_bytes"]):
+            lines.append(
+                f"{resource_type:<26}{stats['chunks']:>8}{stats['resources'] - stats['chunks']:>9}"
+                f"{stats['original_bytes']:>13,}{stats['kept_bytes']:>13,}"
+            )
+
+        totals = self.totals()
+        saved_pct = 100 * totals["bytes_saved"] / totals["original_bytes"] if totals["original_bytes"] else 0
+        lines.append(
+            f"Total: {totals['chunks']} chunks ({totals['chunks_saved']} saved), "
+            f"{totals['kept_bytes']:,} of {totals['original_bytes']:,} bytes ({saved_pct:.1f}% saved)"
+        )
+        return "\n".join(lines)
@@ -1,9 +1,13 @@
 import os
 import argparse
 from src.data_processor import SyntheaDataProcessor
-from src.vector_store import HealthVectorStore
+from src.ingest_profile import IngestProfile
+from src.vector_store import HealthVectorStore, EMBEDDING_BACKENDS
 from src.prompt_templates import HealthPromptTemplates
-from src.chatbot import HealthManagementChatbot
+from src.chatbot import HealthManagementChatbot, get_llm
+from src.patient_digest import PatientDigestStore
+from src.model_router import ModelRouter
+from src.timeline_index import TimelineIndex, parse_date_window, parse_latest_count
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -17,16 +21,51 @@ def setup_argparse():
     parser.add_argument('--persist-dir', type=str, default='./vector_db_v2',
                         help='Directory to persist vector store (default: ./vector_db_v2)')
     parser.add_argument('--model', type=str, default='gpt-4o-mini',
-                        help='LLM model to use (default: gpt-4o-mini)')
+                        help='LLM model to use, or "auto" to route between llama3.2 and gpt-4o-mini per query '
+                             '(default: gpt-4o-mini)')
     parser.add_argument('--prompt-type', type=str, default='basic',
                         choices=['basic', 'enhanced', 'medication'],
                         help='Type of prompt template to use')
     parser.add_argument('--skip-processing', action='store_true',
                         help='Skip data processing and use existing vector store')
+    parser.add_argument('--ingest-profile', type=str,
+                        help='JSON ingest profile selecting resource types and fields to embed '
+                             '(default: built-in clinical profile)')
+    parser.add_argument('--keep-all-resources', action='store_true',
+                        help='Embed every resource unchanged, ignoring the ingest profile')
+    parser.add_argument('--embedding-backend', type=str, default='torch', choices=EMBEDDING_BACKENDS,
+                        help='Embedding inference backend; onnx and int8 are CPU-optimized, int8 needs a '
+                             'vector store built with int8 (default: torch)')
+    parser.add_argument('--embedding-threads', type=int,
+                        help='Number of CPU threads for embedding inference')
+    parser.add_argument('--date-filter', action='store_true',
+                        help='Pre-filter retrieval by a date window parsed from the question')
+
+    subparsers = parser.add_subparsers(dest='command')
+    digest_parser = subparsers.add_parser(
+        'digest', help='Generate per-patient summary digests from --data-dir (offline batch job)')
+    digest_parser.add_argument('--workers', type=int, default=4,
+                               help='Number of patients processed in parallel (default: 4)')
+    digest_parser.add_argument('--force', action='store_true',
+                               help='Regenerate digests even for unchanged patients')
+    digest_parser.add_argument('--digest-model', type=str,
+                               help='Optional LLM used to write the digests as prose')
 
     return parser.parse_args()
 
 
+def generate_digests(data_dir, digest_store, workers=4, force=False, model_name=None):
+    """Generate patient digests, optionally rewriting them with an LLM."""
+    llm = get_llm(model_name) if model_name else None
+    prompt_template = HealthPromptTemplates.get_patient_digest_template() if llm else None
+
+    print(f"Generating patient digests in {digest_store.digest_directory}...")
+    counts = digest_store.generate_all(data_dir, max_workers=workers, force=force,
+                                       llm=llm, prompt_template=prompt_template, model_name=model_name)
+    print(f"Digests: {counts['generated']} generated, {counts['unchanged']} unchanged, "
+          f"{counts['skipped']} non-patient files skipped.")
+
+
 def main():
     """Main function to set up and run the health management chatbot."""
     # Parse command line arguments
@@ -34,10 +73,21 @@ def main():
 
     # Ensure persist_dir exists
     os.makedirs(args.persist_dir, exist_ok=True)
+    digest_store = PatientDigestStore(os.path.join(args.persist_dir, "digests"))
+
+    if args.command == 'digest':
+        if not args.data_dir:
+            raise ValueError("--data-dir must be provided to generate digests")
+        generate_digests(args.data_dir, digest_store, args.workers, args.force, args.digest_model)
+        return
+
     print(f"Using vector store at: {os.path.abspath(args.persist_dir)}")
 
     # Set up vector store
-    vector_store = HealthVectorStore(args.persist_dir)
+    vector_store = HealthVectorStore(args.persist_dir, embedding_backend=args.embedding_backend,
+                                     num_threads=args.embedding_threads)
+    timeline_path = os.path.join(args.persist_dir, "timeline_index.json")
+    timeline_index = None
 
     # Process data only if not skipping
     if not args.skip_processing:
@@ -45,7 +95,13 @@ def main():
             raise ValueError("--data-dir must be provided when not using --skip-processing")
 
         print(f"Loading data from {args.data_dir}...")
-        data_processor = SyntheaDataProcessor(args.data_dir)
+        if args.keep_all_resources:
+            ingest_profile = IngestProfile.keep_all()
+        elif args.ingest_profile:
+            ingest_profile = IngestProfile.from_file(args.ingest_profile)
+        else:
+            ingest_profile = IngestProfile()
+        data_processor = SyntheaDataProcessor(args.data_dir, ingest_profile=ingest_profile)
 
         # Load health records
         health_records = data_processor.load_all_health_records()
@@ -54,6 +110,7 @@ def main():
         # Process records for embedding
         texts = data_processor.process_for_embedding() #(health_records)
         print(f"Generated {len(texts)} text chunks for embedding.")
+        print(data_processor.ingest_report.format())
 
         # Create documents and vector store
         print("Setting up vector store...")
@@ -62,11 +119,21 @@ def main():
         vector_store.create_vector_store(documents)
         vector_store.save() 
         print(f"Vector store created and saved to {args.persist_dir}")
+
+        timeline_index = data_processor.timeline_index
+        timeline_index.save(timeline_path)
+        print(f"Timeline index saved to {timeline_path}")
+
+        # Keep writing digests with whichever model the digest job last used
+        generate_digests(args.data_dir, digest_store, model_name=digest_store.stored_model())
     else:
         print("Skipping data processing, loading existing vector store...")
         try:
             vector_store.load()
             print("Existing vector store loaded successfully")
+            if os.path.exists(timeline_path):
+                timeline_index = TimelineIndex.load(timeline_path)
+                print("Timeline index loaded successfully")
         except Exception as e:
             print(f"Error loading vector store: {e}")
             print("Make sure you've previously created a vector store or provide --data-dir to create one")
@@ -84,6 +151,9 @@ def main():
 
     
 
+    # One router for the whole session so its routing stats accumulate
+    router = ModelRouter() if args.model == 'auto' else None
+
     # Simple command line interface
     while True:
         query = input("\nEnter your health question: ")
@@ -95,14 +165,27 @@ def main():
         if not patient_id:
             patient_id = None
 
+        # Restrict retrieval to the dates the question asks about
+        date_window = None
+        if args.date_filter:
+            date_window = parse_date_window(query)
+            latest = parse_latest_count(query)
+            if date_window is None and latest and patient_id and timeline_index:
+                latest_count, resource_type = latest
+                date_window = timeline_index.latest_window(patient_id, latest_count, [resource_type])
+            if date_window:
+                print(f"Filtering records from {date_window[0]} to {date_window[1]}")
+
         # Get retriever
-        retriever = vector_store.get_retriever({"k": 5}, patient_id= patient_id)
+        retriever = vector_store.get_retriever({"k": 5}, patient_id= patient_id, date_window=date_window)
             
         # Create chatbot
         chatbot = HealthManagementChatbot(
             retriever=retriever,
             prompt_template=prompt_template,
-            model_name=args.model
+            model_name=args.model,
+            digest_store=digest_store,
+            router=router
         )
 
         print("\nHealth Management Chatbot is ready!")
@@ -110,12 +193,22 @@ def main():
         print("Type 'exit' to quit the chatbot.")
 
         print("\nProcessing your query...\n")
-        response = chatbot.get_answer(query, patient_id)
+        try:
+            response = chatbot.get_answer(query, patient_id)
+        except Exception as e:
+            print(f"⚠️ An error occurred: {e}")
+            continue
 
         print("=" * 80)
         print(response)
         print("=" * 80)
 
+    if router and router.decisions:
+        stats = router.stats()
+        print(f"Routing: {stats['answered_by']}, {stats['fallbacks']} fallbacks, {stats['failures']} failed, "
+              f"{stats['mean_total_latency']:.2f}s mean wait, "
+              f"~{stats['estimated_seconds_saved']:.1f}s saved by the fast model")
+
     print("Thank you for using the Health Management Chatbot!")
 
 
@@ -0,0 +1,206 @@
+import queue
+import re
+import threading
+import time
+from typing import List, Dict, Any, Callable, Tuple
+
+
+# Words that signal a question needs reasoning rather than a record lookup
+COMPLEX_QUERY = re.compile(
+    r"\b(why|explain|compare|comparison|trend|trends|changed?|interactions?|interact|should|risks?|"
+    r"recommend\w*|relationship|related|cause[sd]?|affect\w*|analy[sz]\w*|plan|improve|worse|better)\b"
+)
+
+# Retrieved chunks per query (k in main.py / streamlit_app.py) and a per-chunk
+# size budget: ingested chunks are ~0.9k chars median, ~1.2k at the 90th
+# percentile and ~1.4k on average for Observations. Anything beyond k typical
+# chunks (e.g. a huge Observation) goes to the strong model. The digest the
+# chatbot prepends is not counted, since every query with a patient carries it.
+FAST_CONTEXT_CHUNKS = 5
+FAST_CHUNK_CHARS = 1600
+
+
+class ModelRouter:
+    """
+    Routes each query to a fast local model or a stronger hosted model
+    based on how complex it is and how much context it carries, falling
+    back to the other model on timeout or error.
+    """
+
+    def __init__(
+            self,
+            fast_model: str = "llama3.2",
+            strong_model: str = "gpt-4o-mini",
+            temperature: float = 0,
+            timeout: float = 30,
+            max_fast_words: int = 25,
+            max_fast_context_chars: int = FAST_CONTEXT_CHUNKS * FAST_CHUNK_CHARS,
+            llm_factory: Callable[..., Any] = None
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            fast_model: Model for simple lookups (e.g. a local Ollama model)
+            strong_model: Model for harder reasoning
+            temperature: The temperature setting for both models
+            timeout: Seconds to wait for a model before falling back
+            max_fast_words: Longest question still sent to the fast model
+            max_fast_context_chars: Most retrieved context (excluding the digest) still sent
+                to the fast model
+            llm_factory: Builds a model from (model_name, temperature); defaults to get_llm.
+                Pass a factory returning stub models to run offline.
+        """
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.temperature = temperature
+        self.timeout = timeout
+        self.max_fast_words = max_fast_words
+        self.max_fast_context_chars = max_fast_context_chars
+        self.llm_factory = llm_factory
+        self.models: Dict[str, Any] = {}
+        self.decisions: List[Dict[str, Any]] = []
+
+    def get_model(self, model_name: str):
+        """
+        Get (and cache) the model instance for a model name.
+        """
+        if model_name not in self.models:
+            factory = self.llm_factory
+            if factory is None:
+                from src.chatbot import get_llm
+                factory = get_llm
+            self.models[model_name] = factory(model_name, temperature=self.temperature)
+        return self.models[model_name]
+
+    def classify(self, query: str, context_chars: int = 0) -> Tuple[str, str]:
+        """
+        Decide which model should answer a query.
+
+        Args:
+            query: The user's question
+            context_chars: Size of the retrieved context that goes with it
+
+        Returns:
+            Tuple of (model name, reason)
+        """
+        if context_chars > self.max_fast_context_chars:
+            return self.strong_model, f"large context ({context_chars} chars)"
+        if len(query.split()) > self.max_fast_words:
+            return self.strong_model, "long question"
+        if query.count("?") > 1:
+            return self.strong_model, "multiple questions"
+        match = COMPLEX_QUERY.search(query.lower())
+        if match:
+            return self.strong_model, f"reasoning keyword '{match.group(0)}'"
+        return self.fast_model, "simple lookup"
+
+    def run(self, query: str, call: Callable[[Any], Any], context_chars: int = 0) -> Any:
+        """
+        Answer a query with the routed model, falling back on failure.
+
+        Args:
+            query: The user's question, used for routing
+            call: Function taking a model and returning the answer
+            context_chars: Size of the retrieved context, used for routing
+
+        Returns:
+            Whatever ``call`` returns
+
+        Raises:
+            RuntimeError: If both models fail; the decision is recorded first
+        """
+        model_name, reason = self.classify(query, context_chars)
+        fallback_name = self.fast_model if model_name == self.strong_model else self.strong_model
+        decision = {"query": query, "model": model_name, "reason": reason, "context_chars": context_chars,
+                    "fallback": False, "error": None}
+
+        start = time.perf_counter()
+        model_start = start
+        try:
+            result = self._call_with_timeout(call, model_name)
+        except Exception as e:
+            decision["error"] = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            decision["fallback"] = True
+            print(f"⚠️ {model_name} failed ({decision['error']}), falling back to {fallback_name}")
+            model_name = fallback_name
+            model_start = time.perf_counter()
+            try:
+                result = self._call_with_timeout(call, model_name)
+            except Exception as e:
+                decision["fallback_error"] = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+                decision["answered_by"] = None
+                decision["latency"] = None
+                decision["total_latency"] = time.perf_counter() - start
+                self.decisions.append(decision)
+                print(f"⚠️ {fallback_name} also failed ({decision['fallback_error']}), no answer "
+                      f"after {decision['total_latency']:.2f}s")
+                raise RuntimeError(f"Both models failed: {decision['model']} ({decision['error']}), "
+                                   f"{fallback_name} ({decision['fallback_error']})") from e
+
+        end = time.perf_counter()
+        decision["answered_by"] = model_name
+        # Time the answering model took, and the wall time the user waited (including a failed first try)
+        decision["latency"] = end - model_start
+        decision["total_latency"] = end - start
+        self.decisions.append(decision)
+        print(f"🔀 Routed to {decision['model']} ({reason}), answered by {model_name} "
+              f"in {decision['latency']:.2f}s ({decision['total_latency']:.2f}s total)")
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summarize routing decisions and the latency saved by the fast model.
+
+        Savings are estimated as the strong model's mean latency minus the
+        wall time of every query routed to the fast model, so time lost to
+        fast-model timeouts and errors counts against the savings.
+
+        Returns:
+            Dictionary with per-model counts and mean latency, mean wall time,
+            fallbacks, failures (both models failed) and estimated savings
+        """
+        latencies: Dict[str, List[float]] = {}
+        for decision in self.decisions:
+            if decision["answered_by"] is None:
+                continue
+            latencies.setdefault(decision["answered_by"], []).append(decision["latency"])
+
+        mean_latency = {name: sum(values) / len(values) for name, values in latencies.items()}
+        saved = 0.0
+        if self.strong_model in mean_latency:
+            saved = sum(mean_latency[self.strong_model] - decision["total_latency"]
+                        for decision in self.decisions
+                        if decision["model"] == self.fast_model)
+        total_latencies = [decision["total_latency"] for decision in self.decisions]
+
+        return {
+            "queries": len(self.decisions),
+            "answered_by": {name: len(values) for name, values in latencies.items()},
+            "mean_latency": mean_latency,
+            "mean_total_latency": sum(total_latencies) / len(total_latencies) if total_latencies else 0.0,
+            "fallbacks": sum(1 for decision in self.decisions if decision["fallback"]),
+            "failures": sum(1 for decision in self.decisions if decision["answered_by"] is None),
+            "estimated_seconds_saved": saved,
+        }
+
+    def _call_with_timeout(self, call: Callable[[Any], Any], model_name: str) -> Any:
+        # A fresh daemon thread per call: a hung model cannot be interrupted,
+        # but it must not hold up the fallback call or block process exit
+        model = self.get_model(model_name)
+        outcome = queue.Queue(maxsize=1)
+
+        def target():
+            try:
+                outcome.put((True, call(model)))
+            except Exception as e:
+                outcome.put((False, e))
+
+        threading.Thread(target=target, name=f"router-{model_name}", daemon=True).start()
+        try:
+            ok, value = outcome.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no response after {self.timeout}s")
+        if not ok:
+            raise value
+        return value
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from src.reference_index import ReferenceIndex
+from src.timeline_index import resource_date
+
+
+# Bump when the digest format changes so every patient is regenerated
+DIGEST_VERSION = 1
+
+# How many vital signs to keep in a digest
+MAX_VITALS = 8
+
+# Written by generate_all() with the model the digest job used
+DIGEST_META_FILE = "meta.json"
+
+# Whole-record summary requests only, e.g. "Can you summarize my health?" or
+# "Give me a health overview". Summaries of anything narrower ("my lab
+# results from 2019", "my last visit") go through retrieval instead.
+_POLITE = r"(?:(?:hi|hello|hey)[,!]?\s+)?(?:please\s+)?(?:(?:can|could|would|will)\s+you\s+)?(?:please\s+)?"
+_RECORD = r"(?:my|the patient'?s?)\s+(?:overall\s+|whole\s+|entire\s+)?" \
+          r"(?:health|health\s+records?|medical\s+records?|records?|medical\s+history|health\s+history)"
+SUMMARY_QUERY = re.compile(
+    rf"^{_POLITE}(?:"
+    rf"summari[sz]e\s+{_RECORD}"
+    rf"|(?:give|show|tell)\s+(?:me\s+)?(?:a|an)\s+(?:summary|overview)\s+of\s+{_RECORD}"
+    rf"|(?:give|show|tell)\s+(?:me\s+)?(?:a|an|my)\s+(?:overall\s+)?(?:health|medical)\s+(?:summary|overview)"
+    rf"|(?:what\s+is|what'?s)\s+(?:an?\s+)?(?:summary|overview)\s+of\s+{_RECORD}"
+    rf"|(?:overall\s+)?(?:health|medical)\s+(?:summary|overview)"
+    rf")(?:\s+(?:please|overall))?\s*[?.!]*$"
+)
+
+
+def is_summary_query(query: str) -> bool:
+    """
+    Check whether a question asks for a summary of the whole health record
+    and nothing narrower.
+    """
+    return bool(SUMMARY_QUERY.match(query.strip().lower()))
+
+
+def extract_digest_facts(bundle: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pull the facts a health summary needs out of a patient bundle.
+
+    Args:
+        bundle: A Synthea patient bundle
+
+    Returns:
+        Dictionary with patient, problems, medications, allergies and vitals
+    """
+    index = ReferenceIndex()
+    index.add_bundle(bundle)
+
+    facts = {"patient": {}, "problems": [], "medications": [], "allergies": [], "vitals": []}
+    vitals: Dict[str, Dict[str, Any]] = {}
+
+    for entry in bundle.get("entry", []):
+        resource = entry.get("resource", {})
+        resource_type = resource.get("resourceType")
+
+        if resource_type == "Patient":
+            facts["patient"] = {
+                "id": resource.get("id", ""),
+                "name": index.display(f"urn:uuid:{resource.get('id')}"),
+                "gender": resource.get("gender", ""),
+                "birth_date": resource.get("birthDate", ""),
+            }
+        elif resource_type == "Condition" and _status(resource) == "active":
+            problem = resource.get("code", {}).get("text", "")
+            if problem and problem not in facts["problems"]:
+                facts["problems"].append(problem)
+        elif resource_type == "MedicationRequest" and resource.get("status") == "active":
+            medication = resource.get("medicationCodeableConcept", {}).get("text") or \
+                index.display(resource.get("medicationReference", {}))
+            if medication and medication not in facts["medications"]:
+                facts["medications"].append(medication)
+        elif resource_type == "AllergyIntolerance" and _status(resource) == "active":
+            allergy = resource.get("code", {}).get("text", "")
+            if resource.get("criticality"):
+                allergy += f" ({resource['criticality']} criticality)"
+            if allergy and allergy not in facts["allergies"]:
+                facts["allergies"].append(allergy)
+        elif resource_type == "Observation" and _is_vital_sign(resource):
+            name = resource.get("code", {}).get("text", "")
+            when = resource_date(resource)
+            if name and when and (name not in vitals or vitals[name]["date"] < when.isoformat()):
+                vitals[name] = {"name": name, "value": _observation_value(resource), "date": when.isoformat()}
+
+    facts["vitals"] = sorted(vitals.values(), key=lambda vital: vital["date"], reverse=True)[:MAX_VITALS]
+    return facts
+
+
+def render_digest(facts: Dict[str, Any]) -> str:
+    """
+    Render digest facts as compact plain text.
+    """
+    patient = facts["patient"]
+    lines = [f"Health summary for {patient.get('name') or 'the patient'} "
+             f"(born {patient.get('birth_date') or 'unknown'}, {patient.get('gender') or 'unknown gender'})"]
+    lines.append("Active problems: " + ("; ".join(facts["problems"]) or "none recorded"))
+    lines.append("Current medications: " + ("; ".join(facts["medications"]) or "none recorded"))
+    lines.append("Allergies: " + ("; ".join(facts["allergies"]) or "no known allergies"))
+    if facts["vitals"]:
+        vitals = [f"{vital['name']} {vital['value']} ({vital['date']})" for vital in facts["vitals"]]
+        lines.append("Recent vitals: " + "; ".join(vitals))
+    else:
+        lines.append("Recent vitals: none recorded")
+    return "\n".join(lines)
+
+
+class PatientDigestStore:
+    """
+    Stores precomputed per-patient summary digests as one JSON file per
+    patient, keyed by a hash of the source bundle so unchanged patients
+    are not regenerated.
+    """
+
+    def __init__(self, digest_directory: str):
+        """
+        Initialize the store.
+
+        Args:
+            digest_directory: Directory holding the digest files
+        """
+        self.digest_directory = digest_directory
+
+    def get(self, patient_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a patient's digest record.
+
+        Returns:
+            The stored record, or None if there is no digest for the patient
+        """
+        path = self._path(patient_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                print(f"Error decoding JSON from file: {path}")
+                return None
+
+    def get_digest(self, patient_id: str) -> Optional[str]:
+        """
+        Get a patient's digest text, or None if there is none.
+        """
+        record = self.get(patient_id)
+        return record.get("digest") if record else None
+
+    def stored_model(self) -> Optional[str]:
+        """
+        Get the model the last digest job was run with.
+
+        Taken from the store's meta file rather than from patient records,
+        since a record whose LLM call failed is stored as plain.
+
+        Returns:
+            The model name, or None if the digests are plain (or there are none)
+        """
+        path = os.path.join(self.digest_directory, DIGEST_META_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                return json.load(f).get("model")
+            except json.JSONDecodeError:
+                print(f"Error decoding JSON from file: {path}")
+                return None
+
+    def generate_all(self, data_directory: str, max_workers: int = 4, force: bool = False,
+                     llm=None, prompt_template=None, model_name: str = None) -> Dict[str, int]:
+        """
+        Generate digests for every patient bundle in a directory, concurrently.
+
+        Patients whose bundle is unchanged since their last digest, and
+        whose digest was written by the same model, are skipped unless
+        ``force`` is set.
+
+        Args:
+            data_directory: Directory containing Synthea FHIR JSON files
+            max_workers: Number of patients processed in parallel
+            force: Regenerate every digest
+            llm: Optional chat model that rewrites the facts into prose
+            prompt_template: Prompt with a {facts} variable, required with llm
+            model_name: Name of ``llm``, recorded with each digest and in the store's meta
+                file (None for plain digests)
+
+        Returns:
+            Counts of generated, unchanged and skipped (non-patient/unreadable) files
+        """
+        os.makedirs(self.digest_directory, exist_ok=True)
+        paths = [
+            os.path.join(data_directory, filename)
+            for filename in sorted(os.listdir(data_directory))
+            if filename.endswith(".json")
+        ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                lambda path: self._generate_one(path, force, llm, prompt_template, model_name), paths
+            ))
+
+        with open(os.path.join(self.digest_directory, DIGEST_META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"model": model_name, "generated_at": datetime.now().isoformat(timespec="seconds")}, f)
+
+        return {status: results.count(status) for status in ("generated", "unchanged", "skipped")}
+
+    def _generate_one(self, file_path: str, force: bool, llm, prompt_template, model_name: str) -> str:
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        source_hash = f"{DIGEST_VERSION}:{hashlib.sha256(content).hexdigest()}"
+
+        try:
+            bundle = json.loads(content)
+        except json.JSONDecodeError:
+            print(f"Error decoding JSON from file: {file_path}")
+            return "skipped"
+
+        patient_id = None
+        for entry in bundle.get("entry", []):
+            resource = entry.get("resource", {})
+            if resource.get("resourceType") == "Patient":
+                patient_id = resource.get("id")
+                break
+        if not patient_id:
+            return "skipped"
+
+        existing = self.get(patient_id)
+        if existing and existing.get("source_hash") == source_hash \
+                and existing.get("model") == model_name and not force:
+            return "unchanged"
+
+        facts = extract_digest_facts(bundle)
+        digest = render_digest(facts)
+        written_by = None
+        if llm is not None:
+            try:
+                response = llm.invoke(prompt_template.format_messages(facts=digest))
+                digest = response.content if hasattr(response, "content") else response
+                written_by = model_name
+            except Exception as e:
+                # Recorded as plain so the next run retries with the model
+                print(f"⚠️ LLM digest failed for {patient_id}, keeping plain digest: {e}")
+
+        record = {
+            "patient_id": patient_id,
+            "name": facts["patient"].get("name", ""),
+            "source": os.path.basename(file_path),
+            "source_hash": source_hash,
+            "model": written_by,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "facts": facts,
+            "digest": digest,
+        }
+        tmp_path = self._path(patient_id) + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp_path, self._path(patient_id))
+        return "generated"
+
+    def _path(self, patient_id: str) -> str:
+        return os.path.join(self.digest_directory, f"{patient_id}.json")
+
+
+def _status(resource: Dict[str, Any]) -> str:
+    codings = resource.get("clinicalStatus", {}).get("coding", [{}])
+    return codings[0].get("code", "") if codings else ""
+
+
+def _is_vital_sign(resource: Dict[str, Any]) -> bool:
+    for category in resource.get("category", []):
+        for coding in category.get("coding", []):
+            if coding.get("code") == "vital-signs":
+                return True
+    return False
+
+
+def _observation_value(resource: Dict[str, Any]) -> str:
+    quantity = resource.get("valueQuantity")
+    if quantity:
+        return f"{quantity.get('value')} {quantity.get('unit', '')}".strip()
+    components = []
+    for component in resource.get("component", []):
+        quantity = component.get("valueQuantity", {})
+        if "value" in quantity:
+            name = component.get("code", {}).get("text", "")
+            components.append(f"{name} {quantity['value']} {quantity.get('unit', '')}".strip())
+    if components:
+        return ", ".join(components)
+    return resource.get("valueCodeableConcept", {}).get("text", "")
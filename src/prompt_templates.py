@@ -120,6 +120,28 @@ class HealthPromptTemplates:
 
         return ChatPromptTemplate.from_template(template)
     
+    @staticmethod
+    def get_patient_digest_template() -> ChatPromptTemplate:
+        """
+        Get the prompt used to turn precomputed digest facts into a short summary.
+
+        Returns:
+            ChatPromptTemplate for patient digests
+        """
+        template = """
+        You are a health management assistant writing a short overview of a patient's health record.
+        Below are the key facts extracted from the record:
+        {facts}
+
+        Write a concise, plain-language summary (at most 150 words) covering active problems,
+        current medications, allergies and recent vital signs. Only use the facts above.
+        Do not diagnose or recommend treatment changes.
+
+        Your summary:
+        """
+
+        return ChatPromptTemplate.from_template(template)
+
     @staticmethod
     def get_prompt_template(prompt_type: str) -> ChatPromptTemplate:
         if prompt_type == "basic":
@@ -0,0 +1,208 @@
+from typing import List, Dict, Any
+
+
+# Fields on a resource that point at the clinician responsible for it,
+# in order of preference.
+PRACTITIONER_FIELDS = ["requester", "performer", "asserter", "recorder", "author", "provider"]
+
+# Fields on a resource that point at the place/organization it happened at,
+# in order of preference.
+FACILITY_FIELDS = ["location", "serviceProvider", "facility", "custodian", "provider"]
+
+
+class ReferenceIndex:
+    """
+    Lookup index from FHIR references to compact display records.
+
+    Synthea links resources with ``urn:uuid:<id>`` references inside a
+    patient bundle and with conditional references such as
+    ``Practitioner?identifier=<system>|<value>`` into the separate
+    practitioner and hospital bundles. The index registers every resource
+    under all of these forms so either can be resolved in one lookup.
+    """
+
+    def __init__(self):
+        self.records: Dict[str, Dict[str, Any]] = {}
+
+    def add_bundle(self, bundle: Dict[str, Any]) -> None:
+        """
+        Register every resource of a bundle in the index.
+
+        Args:
+            bundle: A FHIR Bundle as loaded from a Synthea JSON file
+        """
+        for entry in bundle.get("entry", []):
+            resource = entry.get("resource", {})
+            if not resource.get("resourceType"):
+                continue
+            record = self._compact(resource)
+            for key in self._keys(entry, resource):
+                self.records[key] = record
+
+    def resolve(self, reference: Any) -> Dict[str, Any]:
+        """
+        Resolve a reference to its compact display record.
+
+        Args:
+            reference: A FHIR Reference dict or a bare reference string
+
+        Returns:
+            The compact record, or an empty dict if the reference is unknown
+        """
+        if isinstance(reference, dict):
+            if "reference" in reference:
+                reference = reference["reference"]
+            elif "identifier" in reference:
+                identifier = reference["identifier"]
+                reference = f"{identifier.get('system')}|{identifier.get('value')}"
+            else:
+                return {}
+        if not isinstance(reference, str):
+            return {}
+        return self.records.get(reference, {})
+
+    def display(self, reference: Any) -> str:
+        """
+        Get a human readable name for a reference.
+
+        Falls back to the ``display`` carried on the reference itself when
+        the target is not in the index.
+
+        Args:
+            reference: A FHIR Reference dict or a bare reference string
+
+        Returns:
+            Display string, or an empty string if nothing is known
+        """
+        record = self.resolve(reference)
+        if record.get("display"):
+            return record["display"]
+        if isinstance(reference, dict):
+            return reference.get("display", "")
+        return ""
+
+    def denormalize(self, resource: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Resolve the key linked fields of a resource into flat values.
+
+        Picks the prescriber/performer, the facility and the encounter
+        type and date. Values missing on the resource itself are taken
+        from its encounter, so e.g. an Observation inherits the clinician
+        and facility of the visit it was recorded in.
+
+        Args:
+            resource: A FHIR resource
+
+        Returns:
+            Dictionary with any of ``practitioner``, ``facility``,
+            ``encounter_type`` and ``encounter_date``
+        """
+        fields: Dict[str, str] = {}
+
+        practitioner = self._first_display(resource, PRACTITIONER_FIELDS, ("Practitioner",))
+        if practitioner:
+            fields["practitioner"] = practitioner
+        facility = self._first_display(resource, FACILITY_FIELDS, ("Location", "Organization"))
+        if facility:
+            fields["facility"] = facility
+
+        encounter_ref = resource.get("encounter") or resource.get("context")
+        if isinstance(encounter_ref, list):
+            encounter_ref = encounter_ref[0] if encounter_ref else None
+        if resource.get("resourceType") == "Encounter":
+            encounter = self._compact(resource)
+        else:
+            encounter = self.resolve(encounter_ref) if encounter_ref else {}
+            if encounter.get("resourceType") != "Encounter":
+                encounter = {}
+
+        if encounter:
+            if encounter.get("type"):
+                fields["encounter_type"] = encounter["type"]
+            if encounter.get("date"):
+                fields["encounter_date"] = encounter["date"]
+            for key in ("practitioner", "facility"):
+                if key not in fields and encounter.get(key):
+                    fields[key] = self.display(encounter[key])
+
+        return {key: value for key, value in fields.items() if value}
+
+    def _first_display(self, resource: Dict[str, Any], field_names: List[str], types: tuple) -> str:
+        for field_name in field_names:
+            for reference in self._references(resource.get(field_name)):
+                record = self.resolve(reference)
+                if record:
+                    if record.get("resourceType") in types:
+                        return record.get("display", "")
+                    continue
+                # Unresolved reference: trust its type prefix and display text
+                target = reference.get("reference", "")
+                if target.startswith(types) and reference.get("display"):
+                    return reference["display"]
+        return ""
+
+    @staticmethod
+    def _references(value: Any) -> List[Dict[str, Any]]:
+        if isinstance(value, dict):
+            # Encounter.location / participant wrap the reference one level down
+            if "location" in value and isinstance(value["location"], dict):
+                return [value["location"]]
+            if "individual" in value and isinstance(value["individual"], dict):
+                return [value["individual"]]
+            return [value]
+        if isinstance(value, list):
+            references = []
+            for item in value:
+                references.extend(ReferenceIndex._references(item))
+            return references
+        return []
+
+    @staticmethod
+    def _keys(entry: Dict[str, Any], resource: Dict[str, Any]) -> List[str]:
+        resource_type = resource["resourceType"]
+        keys = []
+        if entry.get("fullUrl"):
+            keys.append(entry["fullUrl"])
+        if resource.get("id"):
+            keys.append(f"urn:uuid:{resource['id']}")
+            keys.append(f"{resource_type}/{resource['id']}")
+        for identifier in resource.get("identifier", []):
+            system, value = identifier.get("system"), identifier.get("value")
+            if system and value:
+                keys.append(f"{resource_type}?identifier={system}|{value}")
+                keys.append(f"{system}|{value}")
+        return keys
+
+    @staticmethod
+    def _compact(resource: Dict[str, Any]) -> Dict[str, Any]:
+        resource_type = resource["resourceType"]
+        record: Dict[str, Any] = {"resourceType": resource_type, "id": resource.get("id", "")}
+
+        if resource_type in ("Practitioner", "Patient"):
+            name_info = (resource.get("name") or [{}])[0]
+            parts = name_info.get("prefix", []) + name_info.get("given", []) + [name_info.get("family", "")]
+            record["display"] = " ".join(part for part in parts if part).strip()
+        elif resource_type in ("Organization", "Location"):
+            record["display"] = resource.get("name", "")
+            address = resource.get("address")
+            if isinstance(address, list):
+                address = address[0] if address else {}
+            if address and address.get("city"):
+                record["city"] = address["city"]
+        elif resource_type == "Encounter":
+            encounter_type = (resource.get("type") or [{}])[0]
+            record["type"] = encounter_type.get("text", "")
+            record["date"] = resource.get("period", {}).get("start", "")[:10]
+            record["display"] = f"{record['type']} ({record['date']})".strip()
+            participants = ReferenceIndex._references(resource.get("participant"))
+            if participants:
+                record["practitioner"] = participants[0]
+            facilities = ReferenceIndex._references(resource.get("location")) or \
+                ReferenceIndex._references(resource.get("serviceProvider"))
+            if facilities:
+                record["facility"] = facilities[0]
+        else:
+            code = resource.get("code") or resource.get("medicationCodeableConcept") or {}
+            record["display"] = code.get("text", "") if isinstance(code, dict) else ""
+
+        return record
@@ -0,0 +1,285 @@
+import json
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from heapq import merge
+from itertools import islice
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+
+# Resource types kept on the per-patient timeline
+TIMELINE_RESOURCE_TYPES = ["Encounter", "Observation", "Condition", "MedicationRequest"]
+
+# Where each resource type keeps its clinically relevant date, in order of preference
+DATE_FIELDS = [
+    ("period", "start"),
+    ("effectiveDateTime", None),
+    ("effectivePeriod", "start"),
+    ("onsetDateTime", None),
+    ("recordedDate", None),
+    ("authoredOn", None),
+    ("performedDateTime", None),
+    ("performedPeriod", "start"),
+    ("occurrenceDateTime", None),
+    ("started", None),
+    ("issued", None),
+    ("date", None),
+]
+
+UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+NUMBER_WORDS = {"a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+                "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12}
+
+
+def resource_date(resource: Dict[str, Any]) -> Optional[date]:
+    """
+    Get the clinically relevant date of a FHIR resource.
+
+    Args:
+        resource: A FHIR resource
+
+    Returns:
+        The date, or None if the resource carries no usable date
+    """
+    for field_name, sub_field in DATE_FIELDS:
+        value = resource.get(field_name)
+        if sub_field and isinstance(value, dict):
+            value = value.get(sub_field)
+        if isinstance(value, str) and len(value) >= 10:
+            try:
+                return date.fromisoformat(value[:10])
+            except ValueError:
+                continue
+    return None
+
+
+def date_key(value: date) -> int:
+    """
+    Encode a date as a sortable integer (YYYYMMDD), usable in vector store filters.
+    """
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+def parse_date_window(query: str, today: date = None) -> Optional[Tuple[date, date]]:
+    """
+    Parse a date window out of a natural language question.
+
+    Understands "last/past N days|weeks|months|years", "last year",
+    "this year", "since 2020" and "in 2019".
+
+    Args:
+        query: The user's question
+        today: Reference date (defaults to today)
+
+    Returns:
+        Inclusive (start, end) dates, or None if the question is not date-bounded
+    """
+    today = today or date.today()
+    text = query.lower()
+
+    match = re.search(r"\b(?:last|past|previous)\s+(\d+|[a-z]+)?\s*(day|week|month|year)s?\b", text)
+    if match:
+        count = match.group(1) or "1"
+        count = int(count) if count.isdigit() else NUMBER_WORDS.get(count)
+        if count:
+            return today - timedelta(days=count * UNIT_DAYS[match.group(2)]), today
+
+    if re.search(r"\bthis year\b", text):
+        return date(today.year, 1, 1), today
+
+    match = re.search(r"\bsince\s+((?:19|20)\d{2})\b", text)
+    if match:
+        return date(int(match.group(1)), 1, 1), today
+
+    match = re.search(r"\b(?:in|during)\s+((?:19|20)\d{2})\b", text)
+    if match:
+        year = int(match.group(1))
+        return date(year, 1, 1), date(year, 12, 31)
+
+    return None
+
+
+# Nouns in "latest N ..." questions and the timeline resource type they refer to
+LATEST_NOUNS = {
+    "visit": "Encounter", "encounter": "Encounter",
+    "lab": "Observation", "result": "Observation", "observation": "Observation",
+    "condition": "Condition", "diagnosis": "Condition", "diagnoses": "Condition",
+    "medication": "MedicationRequest", "prescription": "MedicationRequest",
+}
+
+
+def parse_latest_count(query: str) -> Optional[Tuple[int, str]]:
+    """
+    Detect "most recent" / "latest N" style questions.
+
+    Args:
+        query: The user's question
+
+    Returns:
+        Tuple of (number of latest entries asked for, timeline resource type), or None
+    """
+    match = re.search(r"\b(?:most recent|latest|last)\s+(\d+|[a-z]+)?\s*(visit|encounter|lab|result|"
+                      r"observation|condition|diagnosis|diagnoses|medication|prescription)s?\b", query.lower())
+    if not match:
+        return None
+    resource_type = LATEST_NOUNS[match.group(2)]
+    count = match.group(1)
+    if count is None:
+        return 1, resource_type
+    if count.isdigit():
+        return int(count), resource_type
+    return NUMBER_WORDS.get(count, 1), resource_type
+
+
+class TimelineIndex:
+    """
+    Per-patient, date-sorted index over Encounters, Observations,
+    Conditions and MedicationRequests.
+
+    Each patient keeps a sorted list of date keys alongside the entries
+    for every resource type, so range and "latest N" lookups are a binary
+    search and a slice. Entries are appended as they are added and each
+    list is sorted once, on the first lookup after a change.
+    """
+
+    def __init__(self, resource_types: List[str] = None):
+        self.resource_types = resource_types or TIMELINE_RESOURCE_TYPES
+        self.keys: Dict[str, Dict[str, List[int]]] = {}
+        self.entries: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        self.unsorted: Set[Tuple[str, str]] = set()
+
+    def add(self, patient_id: str, resource: Dict[str, Any], summary: str = "") -> None:
+        """
+        Add a resource to a patient's timeline.
+
+        Resources of other types or without a date are ignored.
+
+        Args:
+            patient_id: The patient the resource belongs to
+            resource: A FHIR resource
+            summary: Optional short description (defaults to the resource's code text)
+        """
+        resource_type = resource.get("resourceType")
+        if resource_type not in self.resource_types:
+            return
+        when = resource_date(resource)
+        if when is None:
+            return
+
+        self._append(patient_id, {
+            "date": when.isoformat(),
+            "resource_type": resource_type,
+            "id": resource.get("id", ""),
+            "summary": summary or self._summary(resource),
+        })
+
+    def range(self, patient_id: str, start: date = None, end: date = None,
+              resource_types: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get a patient's entries between two dates (inclusive), oldest first.
+
+        Args:
+            patient_id: The patient to look up
+            start: Earliest date, or None for no lower bound
+            end: Latest date, or None for no upper bound
+            resource_types: Optional resource types to keep
+
+        Returns:
+            List of timeline entries
+        """
+        windows = []
+        for resource_type in self._types(patient_id, resource_types):
+            keys, entries = self._sorted(patient_id, resource_type)
+            low = bisect_left(keys, date_key(start)) if start else 0
+            high = bisect_right(keys, date_key(end)) if end else len(keys)
+            windows.append(entries[low:high])
+        if len(windows) == 1:
+            return windows[0]
+        return list(merge(*windows, key=lambda entry: entry["date"]))
+
+    def latest(self, patient_id: str, n: int = 1, resource_types: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get a patient's N most recent entries, newest first.
+
+        Args:
+            patient_id: The patient to look up
+            n: Number of entries
+            resource_types: Optional resource types to keep
+
+        Returns:
+            List of timeline entries
+        """
+        if n < 1:
+            return []
+        tails = [self._sorted(patient_id, resource_type)[1][-n:][::-1]
+                 for resource_type in self._types(patient_id, resource_types)]
+        if len(tails) == 1:
+            return tails[0]
+        return list(islice(merge(*tails, key=lambda entry: entry["date"], reverse=True), n))
+
+    def latest_window(self, patient_id: str, n: int = 1,
+                      resource_types: List[str] = None) -> Optional[Tuple[date, date]]:
+        """
+        Get the date window covering a patient's N most recent entries.
+
+        Returns:
+            Inclusive (start, end) dates, or None if the patient has no entries
+        """
+        latest = self.latest(patient_id, n, resource_types)
+        if not latest:
+            return None
+        return date.fromisoformat(latest[-1]["date"]), date.fromisoformat(latest[0]["date"])
+
+    def save(self, path: str) -> None:
+        """
+        Save the timeline to a JSON file.
+        """
+        entries = {patient_id: self.range(patient_id) for patient_id in self.entries}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"resource_types": self.resource_types, "entries": entries}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "TimelineIndex":
+        """
+        Load a timeline previously written with save().
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        index = cls(data.get("resource_types"))
+        for patient_id, entries in data.get("entries", {}).items():
+            for entry in entries:
+                index._append(patient_id, entry)
+        return index
+
+    def _append(self, patient_id: str, entry: Dict[str, Any]) -> None:
+        resource_type = entry["resource_type"]
+        self.keys.setdefault(patient_id, {}).setdefault(resource_type, []).append(
+            date_key(date.fromisoformat(entry["date"])))
+        self.entries.setdefault(patient_id, {}).setdefault(resource_type, []).append(entry)
+        self.unsorted.add((patient_id, resource_type))
+
+    def _sorted(self, patient_id: str, resource_type: str) -> Tuple[List[int], List[Dict[str, Any]]]:
+        keys = self.keys.get(patient_id, {}).get(resource_type, [])
+        entries = self.entries.get(patient_id, {}).get(resource_type, [])
+        if (patient_id, resource_type) in self.unsorted:
+            # Stable, so entries on the same date keep the order they were added in
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            keys[:] = [keys[i] for i in order]
+            entries[:] = [entries[i] for i in order]
+            self.unsorted.discard((patient_id, resource_type))
+        return keys, entries
+
+    def _types(self, patient_id: str, resource_types: List[str] = None) -> List[str]:
+        present = self.entries.get(patient_id, {})
+        return [resource_type for resource_type in (resource_types or present) if resource_type in present]
+
+    @staticmethod
+    def _summary(resource: Dict[str, Any]) -> str:
+        concept = resource.get("code") or resource.get("medicationCodeableConcept") or \
+            (resource.get("type") or [{}])[0]
+        summary = concept.get("text", "") if isinstance(concept, dict) else ""
+        quantity = resource.get("valueQuantity")
+        if quantity:
+            summary += f": {quantity.get('value')} {quantity.get('unit', '')}".rstrip()
+        return summary
@@ -1,3 +1,5 @@
+import json
+import os
 from typing import List
 from langchain_community.embeddings import HuggingFaceEmbeddings #OpenAIEmbeddings
 __import__('pysqlite3')
@@ -7,6 +9,81 @@ from langchain_community.vectorstores import Chroma
 # from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
 import torch
+from src.timeline_index import date_key
+
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# "torch": PyTorch, on CUDA when available
+# "onnx": ONNX Runtime export of the same model (CPU)
+# "int8": PyTorch with Linear layers dynamically quantized to int8 (CPU),
+#         except the feed-forward output projections (see get_embeddings)
+EMBEDDING_BACKENDS = ["torch", "onnx", "int8"]
+
+# Minimum cosine similarity between a backend's vectors and the torch
+# vectors for the same text, set just below what src/benchmark_embeddings.py
+# measured on the 1228 bundled fhir/ chunks (benchmarks/embedding_benchmark.json):
+# onnx 0.9999999, int8 0.9748 (mean 0.9894).
+EMBEDDING_TOLERANCE = {"torch": 1.0, "onnx": 0.9999, "int8": 0.97}
+
+# Backends within this tolerance return the same neighbours as torch and can
+# query each other's collections (onnx: recall@5 1.0 on a torch-built
+# collection). int8 finds only 0.88 of them, so it needs its own collection.
+COMPATIBLE_TOLERANCE = 0.9999
+
+# Written next to a persisted collection to record how it was embedded
+EMBEDDING_INFO_FILE = "embedding_info.json"
+
+
+def get_embeddings(backend: str = "torch", num_threads: int = None, model_name: str = EMBEDDING_MODEL):
+    """
+    Create the MiniLM embedding model on the requested backend.
+
+    Args:
+        backend: One of EMBEDDING_BACKENDS
+        num_threads: Optional number of CPU threads used for inference
+        model_name: Hugging Face model name or local path (defaults to EMBEDDING_MODEL)
+
+    Returns:
+        HuggingFaceEmbeddings instance
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    if backend == "onnx":
+        # Needs sentence-transformers>=3.2 and optimum[onnxruntime]
+        model_kwargs = {"device": "cpu", "backend": "onnx"}
+        if num_threads:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = num_threads
+            model_kwargs["model_kwargs"] = {"session_options": session_options}
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs)
+
+    if backend == "int8":
+        # Per-channel weights, and the feed-forward output projection of each
+        # layer left in fp32: quantizing every Linear per-tensor drops the
+        # cosine to torch to ~0.83, quantizing those projections at all keeps
+        # it below ~0.96 (measured with src/benchmark_embeddings.py)
+        embeddings = HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"device": "cpu"})
+        qconfig_spec = {
+            name: torch.ao.quantization.per_channel_dynamic_qconfig
+            for name, module in embeddings.client.named_modules()
+            if isinstance(module, torch.nn.Linear) and not (name.endswith("output.dense") and ".attention." not in name)
+        }
+        torch.ao.quantization.quantize_dynamic(embeddings.client, qconfig_spec, inplace=True)
+        return embeddings
+
+    if not torch.cuda.is_available():
+        # raise RuntimeError("CUDA (GPU) not available. Please run on a machine with a CUDA-enabled GPU.")
+        device = "cpu"
+    else:
+        device = "cuda"
+        print(f"✅ Using GPU: {torch.cuda.get_device_name(0)}")
+    return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"device": device}) #OpenAIEmbeddings()
 
 
 class HealthVectorStore:
@@ -14,20 +91,17 @@ class HealthVectorStore:
     Manages the vector database for health record embeddings.
     """
 
-    def __init__(self, persist_directory: str = None):
+    def __init__(self, persist_directory: str = None, embedding_backend: str = "torch", num_threads: int = None):
         """
         Initialize the vector store with embedding model.
 
         Args:
             persist_directory: Optional directory to persist vector store
+            embedding_backend: Embedding backend, one of EMBEDDING_BACKENDS
+            num_threads: Optional number of CPU threads for embedding inference
         """
-        if not torch.cuda.is_available():
-            # raise RuntimeError("CUDA (GPU) not available. Please run on a machine with a CUDA-enabled GPU.")
-            device = "cpu"
-        else:
-            device = "cuda"
-            print(f"✅ Using GPU: {torch.cuda.get_device_name(0)}")
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2", model_kwargs={"device": device}) #OpenAIEmbeddings()
+        self.embeddings = get_embeddings(embedding_backend, num_threads)
+        self.embedding_backend = embedding_backend
         self.persist_directory = persist_directory
         self.vectorstore = None
 
@@ -65,18 +139,22 @@ class HealthVectorStore:
                 embedding=self.embeddings,
                 persist_directory=self.persist_directory
             )
+            self._write_embedding_info()
         else:
             self.vectorstore = Chroma.from_documents(
                 documents=documents,
                 embedding=self.embeddings
             )
 
-    def get_retriever(self, search_kwargs=None, patient_id=None):
+    def get_retriever(self, search_kwargs=None, patient_id=None, date_window=None):
         """
         Get a retriever from the vector store.
 
         Args:
             search_kwargs: Optional search parameters
+            patient_id: Optional patient ID to restrict results to
+            date_window: Optional inclusive (start, end) dates; only chunks
+                whose ``date`` metadata falls inside it are ranked
 
         Returns:
             A retriever object
@@ -86,9 +164,19 @@ class HealthVectorStore:
 
         if search_kwargs is None:
             search_kwargs = {"k": 5}
-        
+
+        conditions = []
         if patient_id is not None:
-            search_kwargs["filter"] = {"patient_id": patient_id}
+            conditions.append({"patient_id": patient_id})
+        if date_window is not None:
+            start, end = date_window
+            conditions.append({"date": {"$gte": date_key(start)}})
+            conditions.append({"date": {"$lte": date_key(end)}})
+
+        if len(conditions) == 1:
+            search_kwargs["filter"] = conditions[0]
+        elif conditions:
+            search_kwargs["filter"] = {"$and": conditions}
 
         return self.vectorstore.as_retriever(search_kwargs=search_kwargs)
 
@@ -112,6 +200,7 @@ class HealthVectorStore:
                 persist_directory=self.persist_directory,
                 embedding_function=self.embeddings
             )
+            self._check_embedding_info()
             
             # print(f"✅ Vector store loaded from {self.persist_directory}")
             # print("📦 Type of vectorstore:", type(self.vectorstore))
@@ -124,4 +213,36 @@ class HealthVectorStore:
 
         # dummy_docs = [Document(page_content="placeholder", metadata={"source": "dummy"})]
         # self.vectorstore = FAISS.from_documents(dummy_docs, self.embeddings)
-        # print("FAISS vector store loaded (placeholder)")
\ No newline at end of file
+        # print("FAISS vector store loaded (placeholder)")
+
+    def _write_embedding_info(self) -> None:
+        """
+        Record the embedding model and backend next to the persisted collection.
+        """
+        os.makedirs(self.persist_directory, exist_ok=True)
+        with open(os.path.join(self.persist_directory, EMBEDDING_INFO_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"model": EMBEDDING_MODEL, "backend": self.embedding_backend}, f)
+
+    def _check_embedding_info(self) -> None:
+        """
+        Warn when a collection is queried with a different model or backend
+        than it was built with.
+        """
+        info_path = os.path.join(self.persist_directory, EMBEDDING_INFO_FILE)
+        if os.path.exists(info_path):
+            with open(info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        else:
+            # Collections built before the backend was recorded all used torch
+            info = {"model": EMBEDDING_MODEL, "backend": "torch"}
+
+        stored_backend = info.get("backend")
+        if info.get("model") != EMBEDDING_MODEL:
+            print(f"⚠️ Vector store was embedded with {info.get('model')}, not {EMBEDDING_MODEL}; "
+                  f"search results will be meaningless. Rebuild the vector store.")
+        elif stored_backend != self.embedding_backend and not (
+                EMBEDDING_TOLERANCE.get(stored_backend, 0) >= COMPATIBLE_TOLERANCE
+                and EMBEDDING_TOLERANCE[self.embedding_backend] >= COMPATIBLE_TOLERANCE):
+            print(f"⚠️ Vector store was embedded with the '{stored_backend}' backend but is queried with "
+                  f"'{self.embedding_backend}', which returns different neighbours. "
+                  f"Rebuild the vector store with this backend.")
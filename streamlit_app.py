@@ -9,18 +9,23 @@ import streamlit as st
 from src.vector_store import HealthVectorStore
 from src.data_processor import SyntheaDataProcessor
 from src.prompt_templates import HealthPromptTemplates
+from src.patient_digest import PatientDigestStore
 
 
 
 VECTOR_DB_PATH = "./vector_db_v2"
 MODEL_NAME = "gpt-4o-mini"
 PROMPT_TYPE = "basic"
+# CPU-only hosts can set EMBEDDING_BACKEND=onnx, or int8 with a vector store built with int8
+# (see src/vector_store.py)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.environ["EMBEDDING_THREADS"]) if os.environ.get("EMBEDDING_THREADS") else None
 
 
 # Sidebar for model settings
 st.sidebar.title("🔧 Settings")
 VECTOR_DB_PATH = "./vector_db_v2"
-model = st.sidebar.selectbox("LLM Model", ["gpt-4o-mini", "llama3.2", "mistral"])
+model = st.sidebar.selectbox("LLM Model", ["gpt-4o-mini", "llama3.2", "mistral", "auto"])
 prompt_type = st.sidebar.selectbox("Prompt Style", ["basic", "enhanced", "medication"])
 
 # Title & description
@@ -30,7 +35,8 @@ st.markdown("Ask health-related questions based on patient FHIR records.")
 # Load chatbot
 @st.cache_resource
 def load_chatbot(model_name, prompt_type):
-    vector_store = HealthVectorStore(persist_directory=VECTOR_DB_PATH)
+    vector_store = HealthVectorStore(persist_directory=VECTOR_DB_PATH, embedding_backend=EMBEDDING_BACKEND,
+                                     num_threads=EMBEDDING_THREADS)
     retriever = None
     prompt_template = None
 
@@ -57,7 +63,8 @@ def load_chatbot(model_name, prompt_type):
         prompt_template=prompt_template if retriever else None,
         model_name=model_name,
         prompt_type=prompt_type,
-        data_processor=data_processor 
+        data_processor=data_processor,
+        digest_store=PatientDigestStore(os.path.join(VECTOR_DB_PATH, "digests"))
     )
 
 chatbot = load_chatbot(model, prompt_type)